@@ -37,3 +37,83 @@ def test_bad_invocation(switches, message_fragment):
     assert result.output.startswith("Usage: ")
     assert "\nERROR " in result.output
     assert message_fragment in result.output
+
+
+def test_cli_resume():
+    runner = CliRunner()
+
+    with runner.isolated_filesystem():
+        with open("file.txt", "w") as file:
+            file.write("text")
+
+        arguments = ["-vv", "--resume", "journal", "file.txt", ".", "apple", "banana"]
+        result = runner.invoke(main, arguments)
+        assert result.exit_code == 0
+        assert "Processing apple\n" in result.output
+
+        result = runner.invoke(main, arguments + ["cherry"])
+        assert result.exit_code == 0
+        assert "Processing apple\n" not in result.output
+        assert "Processing cherry\n" in result.output
+
+        result = runner.invoke(main, ["-D"] + arguments + ["-o", "7", "durian"])
+        assert result.exit_code == 0
+        assert "Processing apple\n" in result.output
+
+        with open("journal") as journal_file:
+            assert journal_file.read().splitlines()[1:] == \
+                ['"apple"', '"banana"', '"cherry"']
+
+
+def test_cli_shard():
+    runner = CliRunner()
+    stuff = [f"item{i}" for i in range(20)]
+
+    with runner.isolated_filesystem():
+        with open("file.txt", "w") as file:
+            file.write("text")
+
+        processed = []
+
+        for index in range(3):
+            arguments = ["-vv", "--shard", f"{index}/3", "file.txt", ".", *stuff]
+            result = runner.invoke(main, arguments)
+            assert result.exit_code == 0
+            assert f"Shard {index}/3 owns " in result.output
+            processed.extend(line[len("Processing "):]
+                             for line in result.output.splitlines()
+                             if line.startswith("Processing "))
+
+        assert sorted(processed) == sorted(stuff)
+
+        result = runner.invoke(main, ["--shard", "3/3", "file.txt", "."])
+        assert result.exit_code == 1
+        assert result.output.startswith("Usage: ")
+        assert "Invalid shard" in result.output
+
+
+def test_cli_shard_resume():
+    runner = CliRunner()
+    stuff = [f"item{i}" for i in range(20)]
+
+    with runner.isolated_filesystem():
+        with open("file.txt", "w") as file:
+            file.write("text")
+
+        for index in range(2):
+            arguments = ["--shard", f"{index}/2", "--resume", "journal", "file.txt",
+                         ".", *stuff]
+            assert runner.invoke(main, arguments).exit_code == 0
+
+        # Every shard's completed items survive in the shared journal, even after
+        # the shard count changes.
+        arguments = ["-vv", "--shard", "0/3", "--resume", "journal", "file.txt", ".",
+                     *stuff]
+        result = runner.invoke(main, arguments)
+        assert result.exit_code == 0
+        assert "Discarding" not in result.output
+        assert "Processing " not in result.output
+
+        with open("journal") as journal_file:
+            assert sorted(journal_file.read().splitlines()[1:]) == \
+                sorted(f'"{item}"' for item in stuff)
@@ -6,6 +6,10 @@
 # Licensed under the GNU General Public License, version 3.
 # Refer to the attached LICENSE file or see <http://www.gnu.org/licenses/> for details.
 
+import os
+import pathlib
+import uuid
+
 from click.core import Option
 from click.testing import CliRunner
 import pytest
@@ -15,11 +19,18 @@ from {{cookiecutter.command_name}}.cli_helper import (
     COMMAND_NAME,
     DEFAULT_CONFIG_FILE_PATH,
     echo_wrapper,
+    file_size_weight,
     get_short_switches,
+    hash_options,
+    input_digest,
     is_option_switch_in_arguments,
     load_toml_config,
+    parse_shard,
     print_config,
     render_toml_config,
+    ResumeJournal,
+    Shard,
+    shard_hash,
     show_version,
 )
 
@@ -75,6 +86,19 @@ def test_echo_wrapper(capsys, arguments, expected):
     assert captured_err.strip() == expected_err
 
 
+def test_file_size_weight():
+    with CliRunner().isolated_filesystem():
+        with open('big.txt', 'w') as big_file:
+            big_file.write("x" * 100)
+
+        with open('empty.txt', 'w'):
+            pass
+
+        assert file_size_weight("big.txt") == 100
+        assert file_size_weight("empty.txt") == 1
+        assert file_size_weight("missing.txt") == 1
+
+
 @pytest.mark.parametrize("options,expected", [
     # options,                                                expected
     ((Option(["--apple"]),),                                  ""),
@@ -85,6 +109,48 @@ def test_get_short_switches(options, expected):
     assert get_short_switches(options) == expected
 
 
+@pytest.mark.parametrize("arguments_a,arguments_b,excluded_options,expected", [
+    # arguments_a,            arguments_b,              excluded_options, expected
+    ({"a": 1, "b": "x"},      {"b": "x", "a": 1},       [],               True),
+    ({"a": 1, "b": "x"},      {"a": 2, "b": "x"},       [],               False),
+    ({"a": 1, "b": "x"},      {"a": 2, "b": "x"},       ["a"],            True),
+    ({"a": (1, 2)},           {"a": (2, 1)},            [],               False),
+])
+def test_hash_options(arguments_a, arguments_b, excluded_options, expected):
+    assert (hash_options(arguments_a, excluded_options) ==
+            hash_options(arguments_b, excluded_options)) == expected
+
+
+def test_hash_options_file():
+    with CliRunner().isolated_filesystem():
+        with open('a.txt', 'w') as file_a, open('b.txt', 'w') as file_b:
+            assert hash_options({"f": file_a}, []) == hash_options({"f": "a.txt"}, [])
+            assert hash_options({"f": file_a}, []) != hash_options({"f": file_b}, [])
+
+
+def test_hash_options_path():
+    assert hash_options({"p": pathlib.Path("a")}, []) == hash_options({"p": "a"}, [])
+
+
+def test_hash_options_uuid():
+    value = uuid.UUID(int=13)
+    assert hash_options({"u": value}, []) == hash_options({"u": str(value)}, [])
+
+
+def test_hash_options_fail():
+    with pytest.raises(CliException, match="'o' option"):
+        hash_options({"o": object()}, [])
+
+    assert hash_options({"o": object()}, ["o"]) == hash_options({}, [])
+
+
+def test_input_digest():
+    digest = input_digest(["apple", "banana"], [1, 2])
+    assert digest == input_digest(["banana", "apple"], [2, 1])
+    assert digest != input_digest(["apple", "banana"], [1, 3])
+    assert digest != input_digest(["apple"], [1])
+
+
 @pytest.mark.parametrize("switches,short_switches,arguments,expected", [
     # switches,         short_switches, arguments,                    expected
     (("-a", "--apple"), "aBcD",         ("",),                        False),
@@ -124,6 +190,26 @@ def test_load_toml_config_pass():
         assert {"variable": 13} == load_toml_config("test.toml")
 
 
+@pytest.mark.parametrize("value,expected", [
+    # value,   expected
+    (None,     (0, 1)),
+    ("",       (0, 1)),
+    ("0/1",    (0, 1)),
+    ("2/4",    (2, 4)),
+    ((3, 4),   (3, 4)),
+])
+def test_parse_shard_pass(value, expected):
+    assert parse_shard(value) == expected
+
+
+@pytest.mark.parametrize("value", [
+    "1", "1/1", "4/4", "-1/4", "0/0", "a/b", "1/2/3", (1,), 7,
+])
+def test_parse_shard_fail(value):
+    with pytest.raises(CliException):
+        parse_shard(value)
+
+
 @pytest.mark.parametrize("options,excluded_options,arguments,expected", [
     # options, excluded_options, arguments, expected
     ([], [], {}, ""),
@@ -143,6 +229,164 @@ def test_print_config(options, excluded_options, arguments, expected):
     assert print_config(options, excluded_options, arguments, mock_render) == expected
 
 
+def test_resume_journal_in_memory():
+    journal = ResumeJournal(None, "abc")
+    journal.record("apple")
+    assert "apple" in journal
+    assert list(journal.pending(["apple", "banana"])) == ["banana"]
+    journal.close()
+
+
+def test_resume_journal_resume():
+    with CliRunner().isolated_filesystem():
+        with ResumeJournal("journal", "abc", sync_count=2) as journal:
+            for key in ("apple", "banana", "line\nbreak"):
+                journal.record(key)
+
+        with ResumeJournal("journal", "abc") as journal:
+            assert not journal.is_invalidated
+            assert len(journal) == 3
+            assert list(journal.pending(["apple", "cherry", "line\nbreak"])) == \
+                ["cherry"]
+            journal.record("cherry")
+
+        with ResumeJournal("journal", "abc") as journal:
+            assert len(journal) == 4
+
+
+def test_resume_journal_invalidated():
+    with CliRunner().isolated_filesystem():
+        with ResumeJournal("journal", "abc") as journal:
+            journal.record("apple")
+
+        with ResumeJournal("journal", "xyz") as journal:
+            assert journal.is_invalidated
+            assert len(journal) == 0
+            journal.record("banana")
+
+        with ResumeJournal("journal", "xyz") as journal:
+            assert not journal.is_invalidated
+            assert list(journal.pending(["apple", "banana"])) == ["apple"]
+
+
+def test_resume_journal_string_keys():
+    with CliRunner().isolated_filesystem():
+        with ResumeJournal("journal", "abc") as journal:
+            journal.record(123)
+            assert 123 in journal
+            assert list(journal.pending([123, 456])) == [456]
+
+        with open("journal", "a") as journal_file:
+            journal_file.write("45")
+
+        with ResumeJournal("journal", "abc") as journal:
+            assert list(journal.pending([123, 45])) == [45]
+
+
+def test_resume_journal_read_only():
+    with CliRunner().isolated_filesystem():
+        with ResumeJournal("missing", "abc", is_read_only=True) as journal:
+            journal.record("apple")
+
+        assert not pathlib.Path("missing").exists()
+
+        with ResumeJournal("journal", "abc") as journal:
+            journal.record("apple")
+
+        with ResumeJournal("journal", "xyz", is_read_only=True) as journal:
+            assert journal.is_invalidated
+            journal.record("banana")
+
+        with ResumeJournal("journal", "abc", is_read_only=True) as journal:
+            assert not journal.is_invalidated
+            assert list(journal.pending(["apple", "banana"])) == ["banana"]
+
+
+def test_resume_journal_not_journal():
+    with CliRunner().isolated_filesystem():
+        with open("important.cfg", "w") as important_file:
+            important_file.write("precious data")
+
+        with pytest.raises(CliException):
+            ResumeJournal("important.cfg", "abc")
+
+        with open("important.cfg") as important_file:
+            assert important_file.read() == "precious data"
+
+
+def test_resume_journal_not_utf8():
+    with CliRunner().isolated_filesystem():
+        with open("binary.dat", "wb") as binary_file:
+            binary_file.write(b"\xff\xfe\x00")
+
+        with pytest.raises(CliException, match="isn't a"):
+            ResumeJournal("binary.dat", "abc")
+
+
+def test_resume_journal_missing_directory():
+    with CliRunner().isolated_filesystem():
+        with pytest.raises(CliException, match="Unable to open"):
+            ResumeJournal(os.path.join("missing", "journal"), "abc")
+
+
+def test_resume_journal_torn_line():
+    with CliRunner().isolated_filesystem():
+        with ResumeJournal("journal", "abc") as journal:
+            journal.record("apple")
+
+        with open("journal", "a") as journal_file:
+            journal_file.write('"bana')
+
+        with ResumeJournal("journal", "abc") as journal:
+            assert list(journal.pending(["apple", "banana"])) == ["banana"]
+            journal.record("banana")
+
+        with ResumeJournal("journal", "abc") as journal:
+            assert len(journal) == 2
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 7])
+def test_shard_select_partition(count):
+    items = [f"item{i}" for i in range(100)]
+    selections = [Shard(index, count).select(items) for index in range(count)]
+    assert sorted(sum(selections, [])) == sorted(items)
+    assert selections == [Shard(index, count).select(items) for index in range(count)]
+    assert all(selection for selection in selections)
+
+
+def test_shard_select_int_keys():
+    items = list(range(20))
+    selections = [Shard(index, 2).select(items, key=int) for index in range(2)]
+    assert sorted(sum(selections, [])) == items
+
+
+def test_shard_select_weighted():
+    weights = {f"item{i}": 1 for i in range(20)}
+    weights["huge"] = 20
+    selections = [Shard(index, 2).select(weights, weight=weights.get)
+                  for index in range(2)]
+    assert sorted(sum(selections, [])) == sorted(weights)
+    assert ["huge"] in selections
+    assert [sum(weights[item] for item in selection) for selection in selections] == \
+        [20, 20]
+
+
+@pytest.mark.parametrize("count,expected", [
+    # count, expected
+    (1,      ""),
+    (2,      "Shard 0/2 owns "),
+])
+def test_shard_select_summary(capsys, count, expected):
+    Shard(0, count, echo=echo_wrapper(2)).select(["apple", "banana"])
+    captured_out, _ = capsys.readouterr()
+    assert captured_out.startswith(expected)
+
+
+def test_shard_hash():
+    assert shard_hash("apple") == shard_hash("apple")
+    assert shard_hash("apple") != shard_hash("banana")
+
+
 EXPECTED_EMPTY_CONFIG = f"""# Sample {COMMAND_NAME} configuration file, by """ + \
     f"""default located at {DEFAULT_CONFIG_FILE_PATH}.
 # Configuration options already set to the default value are commented-out.
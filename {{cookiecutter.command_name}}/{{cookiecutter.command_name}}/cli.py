@@ -6,17 +6,24 @@
 # Licensed under the GNU General Public License, version 3.
 # Refer to the attached LICENSE file or see <http://www.gnu.org/licenses/> for details.
 
+import os
+
 import click
 
 from .cli_helper import (
     cli_config_file_option,
     cli_dry_run_option,
     cli_print_config_option,
+    cli_resume_option,
+    cli_shard_option,
     cli_verbose_option,
     cli_version_option,
     config_command_class,
     echo_wrapper,
+    file_size_weight,
     handle_print_config_option,
+    handle_resume_option,
+    handle_shard_option,
 )
 
 
@@ -55,6 +62,8 @@ from .cli_helper import (
 @cli_config_file_option
 @cli_dry_run_option
 @cli_print_config_option
+@cli_resume_option
+@cli_shard_option
 @cli_verbose_option
 @cli_version_option
 # Sample arguments.
@@ -72,4 +81,33 @@ def main(**kwargs):
     verbose = max(kwargs["verbose"], 1 if is_dry_run else 0)
 
     # Take echo() for a spin.
-    echo_wrapper(verbose)(kwargs)
+    echo = echo_wrapper(verbose)
+    echo(kwargs)
+
+    shard = handle_shard_option()
+
+    # Process only this --shard's PATH entries, balanced between the shards by file
+    # size.
+    path = kwargs["path"]
+    entries = (
+        [os.path.join(path, entry) for entry in sorted(os.listdir(path))]
+        if os.path.isdir(path)
+        else [path]
+    )
+
+    for entry in shard.select(
+        entries, weight=file_size_weight, description="PATH entries"
+    ):
+        echo(f"Scanning {entry}", 2)
+
+    # Process only this --shard's STUFF items, skipping any already completed by an
+    # interrupted --resume run. The work items themselves aren't options, so adding
+    # more of them keeps the journal valid.
+    stuff = shard.select(kwargs["stuff"], description="STUFF items")
+
+    with handle_resume_option(excluded_options=["stuff"]) as journal:
+        for item in journal.pending(stuff):
+            echo(f"Processing {item}", 2)
+
+            if not is_dry_run:
+                journal.record(item)
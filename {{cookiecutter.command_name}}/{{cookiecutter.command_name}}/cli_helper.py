@@ -6,11 +6,14 @@
 # Licensed under the GNU General Public License, version 3.
 # Refer to the attached LICENSE file or see <http://www.gnu.org/licenses/> for details.
 
+import hashlib
+import heapq
+import io
+import json
 import os
 import pathlib
 import sys
-
-import pkg_resources
+import uuid
 
 import click
 import toml
@@ -25,7 +28,13 @@ DEFAULT_CONFIG_FILE_PATH = os.path.join(
     click.get_app_dir(app_name=COMMAND_NAME, force_posix=True), f"{COMMAND_NAME}.toml"
 )
 DEFAULT_CONFIG_FILE_OPTION = "config_file"
+DEFAULT_DRY_RUN_OPTION = "dry_run"
+DEFAULT_JOURNAL_SYNC_COUNT = 100
 DEFAULT_PRINT_CONFIG_OPTION = "print_config"
+DEFAULT_RESUME_OPTION = "resume"
+DEFAULT_SHARD_OPTION = "shard"
+DEFAULT_VERBOSE_OPTION = "verbose"
+JOURNAL_HEADER_PREFIX = f"# {COMMAND_NAME} journal "
 
 
 def cli_config_file_option(func):
@@ -67,6 +76,39 @@ def cli_print_config_option(func):
     )(func)
 
 
+def cli_resume_option(func):
+    """ Decorator to enable the --resume option.
+    """
+    return click.option(
+        "--resume",
+        type=click.Path(
+            exists=False,
+            file_okay=True,
+            dir_okay=False,
+            writable=True,
+            resolve_path=True,
+        ),
+        help="Full path of a journal file of completed work items. Items already in "
+        "the journal are skipped, so an interrupted run resumes where it left off. "
+        "The journal is discarded if the options have changed since it was written.",
+    )(func)
+
+
+def cli_shard_option(func):
+    """ Decorator to enable the --shard option.
+    """
+    return click.option(
+        "--shard",
+        metavar="INDEX/COUNT",
+        callback=validate_shard,
+        help="Process only the work items assigned to this shard, INDEX from 0 to "
+        "COUNT-1, so that COUNT runs of the same command split the work between them. "
+        "When items are weighted (e.g., by file size), every run must see exactly the "
+        "same items and weights, or items may be skipped or processed twice: compare "
+        "the input digest shown at -vv across the runs.",
+    )(func)
+
+
 def cli_verbose_option(func):
     """ Decorator to enable the --verbose/-v option.
     """
@@ -195,6 +237,16 @@ def echo_wrapper(verbosity):
     return echo_func
 
 
+def file_size_weight(path):
+    """ Return the size in bytes of the file at the given path, or 1 if it can't be
+        determined, for use as a Shard.select() weight function.
+    """
+    try:
+        return max(os.path.getsize(path), 1)
+    except OSError:
+        return 1
+
+
 def get_short_switches(options):
     """ Return a string of gathered 'short' (1 character) option switches.
     """
@@ -235,6 +287,104 @@ def handle_print_config_option(
     ctx.exit()
 
 
+def handle_resume_option(
+    resume_option=DEFAULT_RESUME_OPTION,
+    verbose_option=DEFAULT_VERBOSE_OPTION,
+    dry_run_option=DEFAULT_DRY_RUN_OPTION,
+    excluded_options=None,
+):
+    """ Return a ResumeJournal for the --resume journal file path, tied to the hash of
+        the resolved options. Without a journal path the ResumeJournal only tracks the
+        work items in memory, as it does for a --dry-run, which never writes the file.
+    """
+    ctx = click.get_current_context()
+    journal_path = ctx.params.get(resume_option)
+
+    excluded_options = [
+        *(excluded_options or []),
+        resume_option,
+        verbose_option,
+        dry_run_option,
+        DEFAULT_CONFIG_FILE_OPTION,
+        DEFAULT_PRINT_CONFIG_OPTION,
+        # A completed work item is complete whichever shard ran it, so the shards,
+        # and a change to their count, can share the journal.
+        DEFAULT_SHARD_OPTION,
+    ]
+    is_read_only = bool(ctx.params.get(dry_run_option))
+
+    journal = ResumeJournal(
+        journal_path=journal_path,
+        options_hash=hash_options(ctx.params, excluded_options) if journal_path else "",
+        is_read_only=is_read_only,
+    )
+
+    if journal.is_invalidated:
+        action = "Ignoring" if is_read_only else "Discarding"
+        echo_wrapper(ctx.params.get(verbose_option, 0))(
+            f"{action} the resume journal '{journal.journal_path}' because the "
+            f"options have changed since it was written.",
+            severity=2,
+        )
+
+    return journal
+
+
+def handle_shard_option(
+    shard_option=DEFAULT_SHARD_OPTION, verbose_option=DEFAULT_VERBOSE_OPTION
+):
+    """ Return a Shard for the --shard INDEX/COUNT option. Without the option, the
+        Shard selects every work item.
+    """
+    ctx = click.get_current_context()
+    index, count = parse_shard(ctx.params.get(shard_option))
+    return Shard(index, count, echo=echo_wrapper(ctx.params.get(verbose_option, 0)))
+
+
+def hash_options(arguments, excluded_options):
+    """ Return a hex digest string that identifies the given option and argument
+        values, less the excluded options. Paths and UUIDs are identified by their
+        string and open files by their name. Any other type that isn't
+        JSON-serializable raises a CliException, as its repr() may not be the same from
+        one run to the next.
+    """
+
+    def serialize_value(value):
+        if isinstance(value, (pathlib.PurePath, uuid.UUID)):
+            return str(value)
+
+        if isinstance(value, (io.IOBase, click.utils.LazyFile)):
+            return str(value.name)
+
+        raise TypeError(type(value).__name__)
+
+    settings = {}
+
+    for name in sorted(arguments):
+        if name in excluded_options:
+            continue
+
+        try:
+            settings[name] = json.dumps(arguments[name], default=serialize_value)
+        except TypeError as exc:
+            raise CliException(
+                f"Unable to hash the value of the '{name}' option of type {exc} for "
+                f"the resume journal. Add '{name}' to the excluded options."
+            ) from exc
+
+    serialized = json.dumps(settings, sort_keys=True)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def input_digest(keys, weights):
+    """ Return a short hex digest of the given item keys and weights, regardless of
+        their order, so that runs that split the same work can confirm that they all
+        saw the same input.
+    """
+    serialized = json.dumps(sorted(zip(keys, weights)))
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:12]
+
+
 def is_option_switch_in_arguments(switches, short_switches, arguments):
     """ Return True if the given option switches appear on the command line. This is,
         admittedly, a bit of a hackish re-implementation of the Click argument parser.
@@ -275,6 +425,30 @@ def load_toml_config(config_path):
     return settings
 
 
+def parse_shard(value):
+    """ Return the (index, count) tuple for the given INDEX/COUNT shard string, or for
+        the whole of the work if there is no value.
+    """
+    if value is None or value == "":
+        return 0, 1
+
+    try:
+        if isinstance(value, str):
+            index, count = (int(part) for part in value.split("/"))
+        else:
+            index, count = (int(part) for part in value)
+    except (TypeError, ValueError):
+        index, count = -1, 0
+
+    if not 0 <= index < count:
+        raise CliException(
+            f"Invalid shard '{value}': expected INDEX/COUNT with INDEX from 0 to "
+            f"COUNT-1."
+        )
+
+    return index, count
+
+
 def print_config(options, excluded_options, arguments, render_func):
     """ Return the sample configuration file for the defined options and command line
         arguments via the given render function as a string.
@@ -318,6 +492,234 @@ def render_toml_config(settings, arguments):
     return "\n".join(lines).strip()
 
 
+class ResumeJournal:
+    """ Append-only journal of completed work item keys, used to skip those items when
+        an interrupted run is resumed. The journal file starts with a header line
+        holding the options hash, followed by one JSON-encoded key string per line.
+        Writes are fsync'd to disk once every sync_count keys, and on close(). A
+        read-only journal loads the file, if any, but only records keys in memory.
+    """
+
+    def __init__(
+        self,
+        journal_path,
+        options_hash,
+        sync_count=DEFAULT_JOURNAL_SYNC_COUNT,
+        is_read_only=False,
+    ):
+        self.journal_path = journal_path
+        self.options_hash = options_hash
+        self.sync_count = max(sync_count, 1)
+        self.is_read_only = is_read_only
+        self.is_invalidated = False
+        self._keys = set()
+        self._journal_file = None
+
+        if journal_path:
+            self._open()
+
+    def __contains__(self, key):
+        return str(key) in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def _header(self):
+        """ The journal file's first line, which ties it to the options hash.
+        """
+        return f"{JOURNAL_HEADER_PREFIX}{self.options_hash}\n"
+
+    def _open(self):
+        """ Load the keys from an existing journal file with a matching header, or
+            start a new journal file otherwise. An existing file that isn't a journal
+            is left alone.
+        """
+        try:
+            self._open_file()
+        except OSError as exc:
+            raise CliException(
+                f"Unable to open resume journal '{self.journal_path}': {exc}"
+            ) from exc
+
+    def _open_file(self):
+        """ Implement _open(), raising OSError for any file system failure.
+        """
+        content = ""
+
+        if pathlib.Path(self.journal_path).exists():
+            with open(self.journal_path, "r", encoding="utf-8") as journal_file:
+                try:
+                    content = journal_file.read()
+                except UnicodeDecodeError:
+                    content = None
+
+        if content is None or (
+            content and not content.startswith(JOURNAL_HEADER_PREFIX)
+        ):
+            raise CliException(
+                f"Resume journal '{self.journal_path}' exists but isn't a "
+                f"{COMMAND_NAME} journal file."
+            )
+
+        if content and not content.startswith(self._header):
+            self.is_invalidated = True
+            content = ""
+
+        if self.is_read_only:
+            self._load_keys(content)
+            return
+
+        if not content:
+            self._journal_file = open(self.journal_path, "w", encoding="utf-8")
+            self._journal_file.write(self._header)
+            self.sync()
+            return
+
+        self._load_keys(content)
+        self._journal_file = open(self.journal_path, "a", encoding="utf-8")
+
+        if not content.endswith("\n"):
+            self._journal_file.write("\n")
+
+    def _load_keys(self, content):
+        """ Load the keys from the lines of the journal file content that follow the
+            header.
+        """
+        header_length = len(self._header)
+
+        for line in content[header_length:].splitlines():
+            try:
+                key = json.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted write: that item wasn't
+                # completely recorded so it'll be redone. Keys are always written as
+                # JSON strings, so a torn line can never parse as a shorter key.
+                continue
+
+            if isinstance(key, str):
+                self._keys.add(key)
+
+    def close(self):
+        """ Sync any outstanding keys to disk and close the journal file.
+        """
+        if self._journal_file is None:
+            return
+
+        self.sync()
+        self._journal_file.close()
+        self._journal_file = None
+
+    def pending(self, items, key=str):
+        """ Yield the items whose keys, as returned by the key function and converted
+            to strings, are not yet recorded in the journal.
+        """
+        for item in items:
+            if str(key(item)) not in self._keys:
+                yield item
+
+    def record(self, key):
+        """ Record the key of a completed work item, converted to a string as for
+            pending(), syncing the journal file to disk once every sync_count keys.
+        """
+        key = str(key)
+
+        if key in self._keys:
+            return
+
+        self._keys.add(key)
+
+        if self._journal_file is None:
+            return
+
+        self._journal_file.write(json.dumps(key) + "\n")
+
+        # Sync in batches: once every sync_count keys.
+        if len(self._keys) % self.sync_count == 0:
+            self.sync()
+
+    def sync(self):
+        """ Flush the journal file and force it to disk.
+        """
+        if self._journal_file is None:
+            return
+
+        self._journal_file.flush()
+        os.fsync(self._journal_file.fileno())
+
+
+class Shard:
+    """ One of count shards of the work items, used to split the same work between
+        several runs of the command. Items are assigned to a shard by a stable hash of
+        their keys, so every run makes the same assignment.
+    """
+
+    def __init__(self, index=0, count=1, echo=None):
+        self.index = index
+        self.count = count
+        self.echo = echo if echo is not None else echo_wrapper(0)
+
+    def select(self, items, key=str, weight=None, description="items"):
+        """ Return the list of items owned by this shard. Each item is identified by
+            the string returned by the key function. Without a weight function items
+            are assigned by their hashes alone; with one, each item is assigned in
+            turn, heaviest first, to the shard with the least total weight, which
+            balances skewed inputs but depends on every run seeing the same items.
+        """
+        items = list(items)
+        hashes = [shard_hash(str(key(item))) for item in items]
+        weights = [weight(item) for item in items] if weight else [1] * len(items)
+
+        if weight:
+            owners = self._balance(hashes, weights)
+        else:
+            owners = [item_hash % self.count for item_hash in hashes]
+
+        owned = [i for i, owner in enumerate(owners) if owner == self.index]
+        total_weight = sum(weights)
+        owned_weight = sum(weights[i] for i in owned)
+
+        if self.count > 1:
+            percentage = 100.0 * owned_weight / total_weight if total_weight else 0.0
+            digest = input_digest([str(key(item)) for item in items], weights)
+            self.echo(
+                f"Shard {self.index}/{self.count} owns {len(owned)} of {len(items)} "
+                f"{description} ({percentage:.1f}% of the total weight, input digest "
+                f"{digest}).",
+                2,
+            )
+
+        return [items[i] for i in owned]
+
+    def _balance(self, hashes, weights):
+        """ Return the owning shard index of each item by assigning the items,
+            heaviest first and then by hash, to the least-loaded shard.
+        """
+        owners = [0] * len(hashes)
+        loads = [(0, shard_index) for shard_index in range(self.count)]
+
+        for i in sorted(range(len(hashes)), key=lambda j: (-weights[j], hashes[j])):
+            load, shard_index = heapq.heappop(loads)
+            owners[i] = shard_index
+            heapq.heappush(loads, (load + weights[i], shard_index))
+
+        return owners
+
+
+def shard_hash(key):
+    """ Return a hash of the given key string that, unlike hash(), is the same in
+        every Python process.
+    """
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
 def _show_usage(self, file=None):
     """ Override the standard usage error message with a splash of colour.
         Taken from https://stackoverflow.com/a/43922088/726
@@ -345,11 +747,32 @@ def show_version(ctx, param, value):
     if not value or ctx.resilient_parsing:
         return
 
+    # Imported here rather than at the top of the module to keep it off the startup
+    # path of every other invocation.
+    # pylint: disable=import-outside-toplevel
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover
+        import importlib_metadata as metadata
+
     try:
-        version = pkg_resources.get_distribution(COMMAND_NAME).version
-    except pkg_resources.DistributionNotFound:  # pragma: no cover
+        version = metadata.version(COMMAND_NAME)
+    except metadata.PackageNotFoundError:  # pragma: no cover
         version = f"({COMMAND_NAME} is not registered)"
 
     click.echo(f"{COMMAND_NAME} version {version}")
     click.echo("Copyright {{cookiecutter.copyright_year}} {{cookiecutter.author_name}}. Licensed under the GPLv3. See LICENSE.")
     ctx.exit()
+
+
+def validate_shard(ctx, param, value):
+    """ Validate the --shard option value, reporting a bad one as a usage error.
+    """
+    _ = ctx, param
+
+    try:
+        parse_shard(value)
+    except CliException as exc:
+        raise click.BadParameter(exc.format_message()) from exc
+
+    return value